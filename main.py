@@ -1,9 +1,30 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+
 from src.router import router
 from src.middleware.cors import setup_cors
+from src.middleware.compression import setup_compression
+from src.database.cache import redis_client, CACHE_PREFIX
+from src.database.models import pwd_context
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    FastAPICache.init(RedisBackend(redis_client), prefix=CACHE_PREFIX)
+    # passlib выбирает и проверяет backend bcrypt при первом хэшировании — делаем это при старте,
+    # а не во время первого входа пользователя.
+    pwd_context.hash("warmup")
+    yield
+    await redis_client.aclose()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 setup_cors(app)
+setup_compression(app)
 
 app.include_router(router)
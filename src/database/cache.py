@@ -0,0 +1,102 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+import hashlib
+import hmac
+import logging
+
+from dotenv import load_dotenv
+from fastapi_cache import FastAPICache
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from starlette.requests import Request
+from starlette.responses import Response
+import os
+
+load_dotenv()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_STORAGE_URL = os.getenv("RATE_LIMIT_STORAGE_URL", "redis://localhost:6379/1")
+
+CACHE_PREFIX = "fastapi-cache"
+CONTACTS_NAMESPACE = "contacts"
+CONTACTS_CACHE_EXPIRE = 30
+# Поколение кэша контактов входит в каждый ключ. Запись в БД меняет поколение одним SET,
+# вместо удаления ключей по шаблону (KEYS блокирует Redis); старые ответы истекают по TTL.
+CONTACTS_GENERATION_KEY = f"{CACHE_PREFIX}:{CONTACTS_NAMESPACE}:generation"
+
+AUTH_CACHE_EXPIRE = 60
+# Без общего секрета каждый процесс использует свой случайный ключ: кэш остается
+# корректным, но воркеры не разделяют его между собой.
+AUTH_CACHE_SECRET = os.getenv("AUTH_CACHE_SECRET", "").encode() or os.urandom(32)
+
+redis_client = aioredis.from_url(REDIS_URL)
+
+logger = logging.getLogger(__name__)
+
+
+async def get_contacts_generation() -> str:
+    """
+    Возвращает текущее поколение кэша контактов.
+    Если кэш недоступен, возвращает "0": чтение кэша тогда тоже не удастся,
+    и ответ будет получен из БД.
+    Returns: str: Поколение кэша контактов.
+    """
+    try:
+        generation = await FastAPICache.get_backend().get(CONTACTS_GENERATION_KEY)
+    except RedisError:
+        logger.warning("Could not read contacts cache generation", exc_info=True)
+        return "0"
+    if isinstance(generation, bytes):
+        generation = generation.decode()
+    return generation or "0"
+
+
+async def invalidate_contacts_cache():
+    """
+    Делает недействительными закэшированные ответы эндпоинтов контактов после изменения данных.
+    Ошибки Redis только логируются: изменение в БД к этому моменту уже сохранено,
+    а устаревшие ответы все равно истекут через CONTACTS_CACHE_EXPIRE секунд.
+    """
+    try:
+        await FastAPICache.get_backend().set(CONTACTS_GENERATION_KEY, uuid4().hex)
+    except RedisError:
+        logger.warning("Could not invalidate contacts cache", exc_info=True)
+
+
+async def contacts_key_builder(
+    func: Callable[..., Any],
+    namespace: str = "",
+    *,
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args: Tuple[Any, ...] = (),
+    kwargs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Строит ключ кэша для эндпоинтов контактов.
+    Ключ зависит только от поколения кэша, имени обработчика, пути и параметров запроса,
+    поэтому сессия БД и прочие зависимости в него не попадают.
+    Args: func (Callable): Кэшируемый обработчик.
+          namespace (str): Пространство имен кэша (префикс + namespace).
+          request (Request, optional): Текущий запрос.
+    Returns: str: Ключ кэша.
+    """
+    generation = await get_contacts_generation()
+    if request is None:
+        return f"{namespace}:{generation}:{func.__name__}"
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    return f"{namespace}:{generation}:{func.__name__}:{request.url.path}?{params}"
+
+
+def auth_cache_key(user_id: int, password: str, hashed_password: str) -> str:
+    """
+    Строит ключ кэша успешной проверки пароля.
+    Пароль не хранится в Redis: в ключ попадает только HMAC-SHA256 от пароля и его хэша,
+    поэтому смена пароля (и соли) автоматически делает старые записи недействительными.
+    Args: user_id (int): Уникальный идентификатор пользователя.
+          password (str): Проверяемый пароль.
+          hashed_password (str): Хэш пароля из БД.
+    Returns: str: Ключ вида auth:{user_id}:{hmac_hex}.
+    """
+    message = f"{password}\0{hashed_password}".encode()
+    digest = hmac.new(AUTH_CACHE_SECRET, message, hashlib.sha256).hexdigest()
+    return f"auth:{user_id}:{digest}"
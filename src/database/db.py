@@ -1,24 +1,37 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+)
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """
-    Генератор для получения сеанса базы данных.
-    Возвращает: Session: Сессия БД, которая автоматически закрывается после использования.
+    Асинхронный генератор для получения сеанса базы данных.
+    Возвращает: AsyncSession: Сессия БД, которая автоматически закрывается после использования.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def get_session_maker():
+    """
+    Возвращает фабрику сессий для кода, которому сессия нужна дольше, чем живет обработчик
+    запроса (например, для потоковых ответов).
+    Возвращает: async_sessionmaker: Фабрика асинхронных сессий БД.
+    """
+    return SessionLocal
@@ -1,11 +1,30 @@
-from sqlalchemy import Column, Integer, String, Date
+from sqlalchemy import Column, Integer, String, Date, Index, DDL, event, extract, func, literal_column, select
 from src.database.db import Base
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
+from src.database.cache import redis_client, auth_cache_key, AUTH_CACHE_EXPIRE
 
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = 10
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], bcrypt__ident="2b", bcrypt__rounds=BCRYPT_ROUNDS, deprecated="auto"
+)
+
+
+def birthday_month_day(birthday):
+    """
+    Строит выражение месяц*100 + день для даты рождения (например, 1231 для 31 декабря).
+    Параметры: birthday: Колонка или выражение с датой.
+    Возвращает: Выражение SQLAlchemy, не зависящее от года.
+    """
+    # Множитель встроен в SQL, а не передан параметром, чтобы выражение в запросе
+    # совпадало с выражением индекса ix_contact_bday_md.
+    return extract("month", birthday) * literal_column("100") + extract("day", birthday)
 
 
 class Contact(Base):
@@ -30,6 +49,30 @@ class Contact(Base):
     birthday = Column(Date)
     additional_info = Column(String, nullable=True)
 
+    __table_args__ = (
+        Index("ix_contact_bday_md", birthday_month_day(birthday)),
+    )
+
+
+# Триграммные GIN-индексы позволяют Postgres использовать индекс для ILIKE '%...%' в поиске.
+event.listen(
+    Contact.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+Index(
+    "ix_contact_fn_trgm", Contact.first_name,
+    postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_contact_ln_trgm", Contact.last_name,
+    postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_contact_email_trgm", Contact.email,
+    postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
 
 class User(Base):
     """
@@ -54,6 +97,10 @@ class User(Base):
         return pwd_context.verify(password, self.hashed_password)
 
 
+# Почта сравнивается без учета регистра: уникальность и поиск идут по lower(email).
+Index("ux_users_email_lower", func.lower(User.email), unique=True)
+
+
 def get_password_hash(password: str) -> str:
     """
     Генерирует хэш пароля.
@@ -62,26 +109,46 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
-def verify_password(plain_password, hashed_password):
+async def verify_password_cached(user_id: int, password: str, hashed_password: str) -> bool:
     """
-     Проверяет, совпадает ли открытый пароль с хэшированным паролем.
-     Параметры: plain_password (str): Открытый пароль.
+     Проверяет пароль, используя кэш успешных проверок в Redis.
+     При попадании в кэш bcrypt не вызывается; при промахе пароль проверяется
+     через bcrypt и успешный результат кэшируется на AUTH_CACHE_EXPIRE секунд.
+     Если Redis недоступен, выполняется обычная проверка.
+     Параметры: user_id (int): Уникальный идентификатор пользователя.
+                password (str): Пароль пользователя.
                 hashed_password (str): Хэшированный пароль.
      Возвращает: bool: True, если пароль совпадает, иначе False.
      """
-    return pwd_context.verify(plain_password, hashed_password)
+    key = auth_cache_key(user_id, password, hashed_password)
+    try:
+        if await redis_client.get(key):
+            return True
+    except RedisError:
+        pass
+    # bcrypt занимает десятки миллисекунд CPU: выполняем его в пуле потоков, не блокируя цикл событий.
+    if not await run_in_threadpool(pwd_context.verify, password, hashed_password):
+        return False
+    try:
+        await redis_client.set(key, 1, ex=AUTH_CACHE_EXPIRE, nx=True)
+    except RedisError:
+        pass
+    return True
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
     """
      Аутентифицирует пользователя по электронной почте и паролю.
-     Параметры: db (Session): Сессия базы данных.
+     Параметры: db (AsyncSession): Сессия базы данных.
                 email (str): Электронная почта пользователя.
                 password (str): Пароль пользователя.
      Возвращает: User: Пользователь, если аутентификация успешна, иначе None.
      """
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
+    result = await db.execute(
+        select(User.id, User.hashed_password).where(func.lower(User.email) == func.lower(email)).limit(1)
+    )
+    credentials = result.first()
+    if credentials is None:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_cached(credentials.id, password, credentials.hashed_password):
         return None
-    return user
\ No newline at end of file
+    return await db.get(User, credentials.id, options=[raiseload("*")])
\ No newline at end of file
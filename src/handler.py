@@ -1,147 +1,283 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import String, and_, bindparam, func, select, or_
+from sqlalchemy.orm import raiseload
 from datetime import datetime, timedelta
-from fastapi import HTTPException, status, Depends, BackgroundTasks
+from functools import lru_cache
+from fastapi import HTTPException, status, Depends, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import jwt
+from jwt import InvalidTokenError as JWTError
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
 from pydantic import EmailStr
+from aiodataloader import DataLoader
+from starlette.concurrency import run_in_threadpool
 import os
+import time
 from dotenv import load_dotenv
 
 from src.database import models
 from src import schemas
 from src.schemas import UserCreate
 from src.database.models import get_password_hash
-from src.database.db import get_db
+from src.database.db import get_db, get_session_maker
 
 
-def get_contact(db: Session, contact_id: int):
+async def get_contact(db: AsyncSession, contact_id: int):
     """
     Получает контакт по его уникальному идентификатору.
-    Args: db (Session): Сессия базы данных.
+    Args: db (AsyncSession): Сессия базы данных.
           contact_id (int): Уникальный идентификатор контакта.
     Returns: models.Contact: Объект контакта, если найден, иначе None.
     """
-    return db.query(models.Contact).filter(models.Contact.id == contact_id).first()
+    result = await db.execute(
+        select(models.Contact).options(raiseload("*")).where(models.Contact.id == contact_id)
+    )
+    return result.scalar_one_or_none()
 
 
-def get_contacts(db: Session, skip: int = 0, limit: int = 10):
+class ContactLoader(DataLoader):
     """
-    Получает список контактов с поддержкой пагинации.
-    Args: db (Session): Сессия базы данных.
-          skip (int): Количество пропущенных записей (по умолчанию 0).
-          limit (int): Максимальное количество возвращаемых записей (по умолчанию 10).
-    Returns: List[models.Contact]: Список контактов.
+    Общий для приложения загрузчик контактов по id.
+    Вызовы load() из одновременно обрабатываемых запросов, сделанные в одной итерации
+    цикла событий, объединяются в один запрос SELECT ... WHERE id IN (...).
+    Кэш загрузчика отключен, чтобы между запросами не возвращались устаревшие данные.
+    Атрибуты: session_factory (async_sessionmaker): Фабрика сессий; каждая пачка
+              выполняется в собственной короткой сессии.
+    """
+
+    def __init__(self, session_factory):
+        super().__init__(cache=False)
+        self.session_factory = session_factory
+
+    async def batch_load_fn(self, contact_ids):
+        """
+        Загружает контакты по списку id одним запросом.
+        Args: contact_ids (List[int]): Уникальные идентификаторы контактов.
+        Returns: List[models.Contact]: Контакты в порядке contact_ids (None для ненайденных).
+        """
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(models.Contact).options(raiseload("*")).where(models.Contact.id.in_(contact_ids))
+            )
+            contacts = {contact.id: contact for contact in result.scalars()}
+        return [contacts.get(contact_id) for contact_id in contact_ids]
+
+
+async def get_contact_loader(request: Request, session_factory=Depends(get_session_maker)):
+    """
+    Возвращает общий загрузчик контактов приложения.
+    Загрузчик создается при первом запросе, так как DataLoader привязывается
+    к циклу событий, в котором он создан.
+    Args: request (Request): Текущий запрос.
+          session_factory (async_sessionmaker): Фабрика сессий базы данных.
+    Returns: ContactLoader: Загрузчик контактов.
     """
-    return db.query(models.Contact).offset(skip).limit(limit).all()
+    loader = getattr(request.app.state, "contact_loader", None)
+    if loader is None:
+        loader = request.app.state.contact_loader = ContactLoader(session_factory)
+    return loader
 
 
-def create_contact(db: Session, contact: schemas.ContactCreate):
+async def get_contacts(db: AsyncSession, after_id: int = None, limit: int = 10):
+    """
+    Получает страницу контактов с keyset-пагинацией по id.
+    Общее количество контактов считается только для первой страницы (after_id is None),
+    чтобы переход по курсору не выполнял count(*) по всей таблице.
+    Выбирается limit + 1 строка: лишняя строка только показывает, что есть следующая страница.
+    Args: db (AsyncSession): Сессия базы данных.
+          after_id (int, optional): id последнего контакта предыдущей страницы (курсор).
+          limit (int): Максимальное количество возвращаемых записей (по умолчанию 10).
+    Returns: Tuple[List[models.Contact], Optional[int], Optional[int]]: Список контактов, общее
+             количество контактов (None для всех страниц, кроме первой) и курсор следующей
+             страницы (None, если страница последняя).
+    """
+    if after_id is None:
+        count_query = select(func.count()).select_from(models.Contact)
+        query = select(models.Contact, count_query.scalar_subquery().label("total"))
+    else:
+        query = select(models.Contact).where(models.Contact.id > after_id)
+    result = await db.execute(query.options(raiseload("*")).order_by(models.Contact.id).limit(limit + 1))
+    rows = result.all()
+    total = None
+    if after_id is None:
+        # Пустая первая страница означает пустую таблицу.
+        total = rows[0].total if rows else 0
+    contacts = [row.Contact for row in rows[:limit]]
+    next_cursor = contacts[-1].id if len(rows) > limit else None
+    return contacts, total, next_cursor
+
+
+async def stream_contacts(session_factory, batch_size: int = 100):
+    """
+    Потоково выдает все контакты, читая их пачками через серверный курсор.
+    Генератор открывает собственную сессию, так как выполняется уже после
+    завершения обработчика запроса.
+    Args: session_factory (async_sessionmaker): Фабрика сессий базы данных.
+          batch_size (int): Количество строк, получаемых из БД за раз (по умолчанию 100).
+    Yields: models.Contact: Очередной контакт.
+    """
+    async with session_factory() as db:
+        result = await db.stream_scalars(
+            select(models.Contact)
+            .options(raiseload("*"))
+            .order_by(models.Contact.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for contact in result:
+            yield contact
+
+
+async def create_contact(db: AsyncSession, contact: schemas.ContactCreate):
     """
     Создает новый контакт.
-    Args: db (Session): Сессия базы данных.
+    Args: db (AsyncSession): Сессия базы данных.
           contact (schemas.ContactCreate): Данные для создания нового контакта.
     Returns: models.Contact: Созданный контакт.
     """
     db_contact = models.Contact(**contact.model_dump())
     db.add(db_contact)
-    db.commit()
-    db.refresh(db_contact)
+    await db.commit()
     return db_contact
 
 
-def update_contact(db: Session, contact_id: int, contact: schemas.ContactUpdate):
+async def update_contact(db: AsyncSession, contact_id: int, contact: schemas.ContactUpdate):
     """
     Обновляет существующий контакт.
-    Args: db (Session): Сессия базы данных.
+    Args: db (AsyncSession): Сессия базы данных.
           contact_id (int): Уникальный идентификатор контакта.
           contact (schemas.ContactUpdate): Данные для обновления контакта.
     Returns: models.Contact: Обновленный контакт, если найден, иначе None.
     """
-    db_contact = get_contact(db, contact_id)
+    db_contact = await get_contact(db, contact_id)
     if db_contact:
         for key, value in contact.model_dump(exclude_unset=True).items():
             setattr(db_contact, key, value)
-        db.commit()
-        db.refresh(db_contact)
+        await db.commit()
     return db_contact
 
 
-def delete_contact(db: Session, contact_id: int):
+async def delete_contact(db: AsyncSession, contact_id: int):
     """
     Удаляет контакт по его уникальному идентификатору.
-    Args: db (Session): Сессия базы данных.
+    Args: db (AsyncSession): Сессия базы данных.
           contact_id (int): Уникальный идентификатор контакта.
     Returns: models.Contact: Удаленный контакт, если найден, иначе None.
     """
-    db_contact = get_contact(db, contact_id)
+    db_contact = await get_contact(db, contact_id)
     if db_contact:
-        db.delete(db_contact)
-        db.commit()
+        await db.delete(db_contact)
+        await db.commit()
     return db_contact
 
 
-def search_contacts(db: Session, name: str = None, surname: str = None, email: str = None):
+def _optional_ilike(column, name: str):
+    """
+    Условие column ILIKE :name, которое выполняется всегда, если параметр равен NULL.
+    """
+    param = bindparam(name, type_=String)
+    return or_(param.is_(None), column.ilike(param))
+
+
+# Один статический запрос для любых комбинаций фильтров: SQL компилируется один раз
+# и кэшируется, а отсутствующие фильтры передаются как NULL.
+_SEARCH_CONTACTS = select(models.Contact).options(raiseload("*")).where(and_(
+    _optional_ilike(models.Contact.first_name, "name"),
+    _optional_ilike(models.Contact.last_name, "surname"),
+    _optional_ilike(models.Contact.email, "email"),
+))
+
+
+async def search_contacts(db: AsyncSession, name: str = None, surname: str = None, email: str = None):
     """
     Ищет контакты по имени, фамилии или электронной почте.
-    Args: db (Session): Сессия базы данных.
+    Args: db (AsyncSession): Сессия базы данных.
          name (str, optional): Имя контакта для поиска.
          surname (str, optional): Фамилия контакта для поиска.
          email (str, optional): Электронная почта контакта для поиска.
     Returns: List[models.Contact]: Список найденных контактов.
     """
-    query = db.query(models.Contact)
-    if name:
-        query = query.filter(models.Contact.first_name.ilike(f"%{name}%"))
-    if surname:
-        query = query.filter(models.Contact.last_name.ilike(f"%{surname}%"))
-    if email:
-        query = query.filter(models.Contact.email.ilike(f"%{email}%"))
-    return query.all()
+    result = await db.execute(_SEARCH_CONTACTS, {
+        "name": f"%{name}%" if name else None,
+        "surname": f"%{surname}%" if surname else None,
+        "email": f"%{email}%" if email else None,
+    })
+    return result.scalars().all()
 
 
-def get_upcoming_birthdays(db: Session):
+async def get_upcoming_birthdays(db: AsyncSession):
     """
     Получает список контактов с днями рождения в ближайшую неделю.
-    Args:db (Session): Сессия базы данных.
+    Args:db (AsyncSession): Сессия базы данных.
     Returns: List[models.Contact]: Список контактов с предстоящими днями рождения.
     """
     today = datetime.now().date()
     next_week = today + timedelta(days=7)
-    return db.query(models.Contact).filter(
-        func.date_trunc('day', models.Contact.birthday) >= today,
-        func.date_trunc('day', models.Contact.birthday) <= next_week
-    ).all()
+    start = today.month * 100 + today.day
+    end = next_week.month * 100 + next_week.day
+    birthday = models.birthday_month_day(models.Contact.birthday)
+    if start <= end:
+        condition = birthday.between(start, end)
+    else:
+        # Неделя переходит через Новый год: 12-28 ... 01-04.
+        condition = or_(birthday >= start, birthday <= end)
+    result = await db.execute(select(models.Contact).options(raiseload("*")).where(condition))
+    return result.scalars().all()
 
 
-def create_user(db: Session, user: UserCreate):
+async def create_user(db: AsyncSession, user: UserCreate):
     """
     Создает нового пользователя.
-    Args: db (Session): Сессия базы данных.
+    Args: db (AsyncSession): Сессия базы данных.
           user (UserCreate): Данные для создания нового пользователя.
     Raises: HTTPException: Если электронная почта уже зарегистрирована.
     Returns: models.User: Созданный пользователь.
     """
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     db_user = models.User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return db_user
 
 
-SECRET_KEY = "my_secret_key"
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+if not SECRET_KEY:
+    # Без ключа токены нельзя ни подписать, ни проверить; известный ключ по умолчанию позволил бы их подделать.
+    raise RuntimeError("SECRET_KEY environment variable is not set")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 
+# Один экземпляр PyJWT и ключ в байтах на весь процесс: ключ не перекодируется при каждом вызове.
+_JWT = jwt.PyJWT()
+_JWT_KEY = SECRET_KEY.encode()
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
+def encode_token(payload: dict) -> str:
+    """
+    Подписывает данные токена ключом приложения.
+    Args: payload (dict): Данные, которые будут закодированы в токен.
+    Returns: str: Закодированный токен.
+    """
+    return _JWT.encode(payload, _JWT_KEY, algorithm=ALGORITHM)
+
+
+def decode_token(token: str) -> dict:
+    """
+    Проверяет подпись и срок действия токена и возвращает его данные.
+    Args: token (str): Токен.
+    Raises: JWTError: Если токен недействителен или срок его действия истек.
+    Returns: dict: Данные токена.
+    """
+    return _JWT.decode(token, _JWT_KEY, algorithms=[ALGORITHM])
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """
     Создает токен доступа.
@@ -155,7 +291,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encode_token(to_encode)
 
 
 def create_refresh_token(data: dict, expires_delta: timedelta = timedelta(days=30)) -> str:
@@ -168,48 +304,68 @@ def create_refresh_token(data: dict, expires_delta: timedelta = timedelta(days=3
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return encode_token(to_encode)
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+@lru_cache(maxsize=4096)
+def decode_access_token(token: str):
+    """
+    Декодирует токен доступа. Результат кэшируется по строке токена,
+    поэтому повторные запросы с тем же токеном не проверяют подпись заново.
+    Срок действия проверяется вызывающим кодом по возвращенному exp.
+    Args: token (str): Токен доступа.
+    Raises: JWTError: Если подпись токена недействительна или срок его действия истек.
+    Returns: tuple: Электронная почта (sub) и время истечения (exp) токена.
+    """
+    payload = decode_token(token)
+    return payload.get("sub"), payload.get("exp")
+
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)):
     """
     Получает текущего пользователя на основе предоставленного токена.
-    Args: db (Session, optional): Сессия базы данных.
+    Пользователь сохраняется в request.state и повторно не загружается в рамках запроса.
+    Args: request (Request): Текущий запрос.
+          db (AsyncSession, optional): Сессия базы данных.
           token (str): Токен доступа.
     Raises: HTTPException: Если токен недействителен или пользователь не найден.
     Returns: models.User: Текущий пользователь.
     """
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        email, expire = decode_access_token(token)
     except JWTError:
         raise credentials_exception
+    if email is None or (expire is not None and expire < time.time()):
+        raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await get_user_by_email(db, email)
     if user is None:
         raise credentials_exception
+    request.state.user = user
     return user
 
 
-def get_user_by_email(db: Session, email: str):
+async def get_user_by_email(db: AsyncSession, email: str):
     """
-    Получает пользователя по его электронной почте.
-    Args: db (Session): Сессия базы данных.
+    Получает пользователя по его электронной почте (без учета регистра).
+    Args: db (AsyncSession): Сессия базы данных.
           email (str): Электронная почта пользователя.
     Returns: models.User: Объект пользователя, если найден, иначе None.
     """
-    return db.query(models.User).filter(models.User.email == email).first()
-
+    result = await db.execute(
+        select(models.User).options(raiseload("*")).where(func.lower(models.User.email) == func.lower(email))
+    )
+    return result.scalar_one_or_none()
 
-load_dotenv()
 
 conf = ConnectionConfig(
     MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
@@ -224,10 +380,6 @@ conf = ConnectionConfig(
     VALIDATE_CERTS=True
 )
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
-
-
 async def send_verification_email(email: EmailStr, background_tasks: BackgroundTasks):
     """
     Отправляет электронное письмо для верификации.
@@ -236,7 +388,7 @@ async def send_verification_email(email: EmailStr, background_tasks: BackgroundT
     Returns: None
     """
     token_data = {"sub": email}
-    token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
+    token = encode_token(token_data)
 
     message = MessageSchema(
         subject="Verify your email",
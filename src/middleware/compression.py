@@ -0,0 +1,7 @@
+from fastapi.middleware.gzip import GZipMiddleware
+
+def setup_compression(app):
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=500,
+    )
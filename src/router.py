@@ -1,7 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-import jwt
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from jwt import InvalidTokenError as JWTError
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -11,64 +10,123 @@ from dotenv import load_dotenv
 import cloudinary
 import cloudinary.uploader
 from fastapi import File, UploadFile
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from fastapi_cache.decorator import cache
 
 
 from src import schemas
 from src import handler
-from src.database.db import get_db
+from src.database import models
+from src.database.db import get_db, get_session_maker
+from src.database.cache import (
+    contacts_key_builder, invalidate_contacts_cache,
+    CONTACTS_NAMESPACE, CONTACTS_CACHE_EXPIRE, RATE_LIMIT_STORAGE_URL,
+)
 from src.schemas import Token, UserLogin
-from src.database.models import verify_password, authenticate_user
-from src.handler import create_access_token, create_refresh_token, get_user_by_email, get_current_user, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from src.database.models import authenticate_user
+from src.handler import create_access_token, create_refresh_token, decode_token, get_user_by_email, get_current_user
 
 
 router = APIRouter(prefix='/contacts', tags=["contacts"])
 
-limiter = Limiter(key_func=get_remote_address)
+# Счетчики лимитов хранятся в Redis и общие для всех воркеров;
+# при недоступности Redis используется временное хранилище в памяти.
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URL,
+    in_memory_fallback_enabled=True,
+)
+
+load_dotenv()
+cloudinary.config(
+  cloud_name=os.getenv("cloud_name"),
+  api_key=os.getenv("api_key"),
+  api_secret=os.getenv("api_secret")
+)
+
+AVATAR_UPLOAD_CHUNK_SIZE = 6_000_000
+
+
+def to_response(contacts):
+    """
+    Преобразует ORM-объекты контактов в схемы ответа, пригодные для кэширования.
+    """
+    return schemas.ContactListAdapter.validate_python(contacts)
+
 
 @router.post("/", response_model=schemas.ContactResponse)
 @limiter.limit("5/minute")  # Ограничение на создание контактов
-def create_contact(contact: schemas.ContactCreate, request: Request, db: Session = Depends(get_db)):
-    return handler.create_contact(db, contact)
+async def create_contact(contact: schemas.ContactCreate, request: Request, db: AsyncSession = Depends(get_db)):
+    db_contact = await handler.create_contact(db, contact)
+    await invalidate_contacts_cache()
+    return db_contact
+
+
+@router.get("/", response_model=schemas.ContactPage)
+@cache(expire=CONTACTS_CACHE_EXPIRE, namespace=CONTACTS_NAMESPACE, key_builder=contacts_key_builder)
+async def read_contacts(after_id: Optional[int] = None, limit: int = Query(10, ge=1, le=100),
+                        db: AsyncSession = Depends(get_db)):
+    contacts, total, next_cursor = await handler.get_contacts(db, after_id=after_id, limit=limit)
+    return schemas.ContactPage(items=to_response(contacts), total=total, next_cursor=next_cursor)
 
+@router.get("/export")
+async def export_contacts(session_factory=Depends(get_session_maker)):
+    async def lines():
+        async for contact in handler.stream_contacts(session_factory):
+            yield schemas.ContactResponse.model_validate(contact).model_dump_json() + "\n"
 
-@router.get("/", response_model=List[schemas.ContactResponse])
-def read_contacts(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return handler.get_contacts(db, skip=skip, limit=limit)
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/search", response_model=List[schemas.ContactResponse])
+@cache(expire=CONTACTS_CACHE_EXPIRE, namespace=CONTACTS_NAMESPACE, key_builder=contacts_key_builder)
+async def search_contacts(name: str = None, surname: str = None, email: str = None, db: AsyncSession = Depends(get_db)):
+    return to_response(await handler.search_contacts(db, name=name, surname=surname, email=email))
+
+@router.get("/birthdays", response_model=List[schemas.ContactResponse])
+@cache(expire=CONTACTS_CACHE_EXPIRE, namespace=CONTACTS_NAMESPACE, key_builder=contacts_key_builder)
+async def get_upcoming_birthdays(db: AsyncSession = Depends(get_db)):
+    return to_response(await handler.get_upcoming_birthdays(db))
+
+@router.put("/avatar")
+async def update_avatar(file: UploadFile = File(...), user: models.User = Depends(get_current_user),
+                        db: AsyncSession = Depends(get_db)):
+    # Загрузка блокирующая: выполняем ее в пуле потоков и отправляем файл частями.
+    result = await run_in_threadpool(
+        cloudinary.uploader.upload_large, file.file,
+        resource_type="image", chunk_size=AVATAR_UPLOAD_CHUNK_SIZE,
+    )
+    user.avatar_url = result['secure_url']
+    await db.commit()
+    return {"msg": "Avatar updated", "avatar_url": result['secure_url']}
 
 @router.get("/{contact_id}", response_model=schemas.ContactResponse)
-def read_contact(contact_id: int, db: Session = Depends(get_db)):
-    db_contact = handler.get_contact(db, contact_id)
+@cache(expire=CONTACTS_CACHE_EXPIRE, namespace=CONTACTS_NAMESPACE, key_builder=contacts_key_builder)
+async def read_contact(contact_id: int, loader: handler.ContactLoader = Depends(handler.get_contact_loader)):
+    db_contact = await loader.load(contact_id)
     if not db_contact:
         raise HTTPException(status_code=404, detail="Contact not found")
-    return db_contact
+    return schemas.ContactResponse.model_validate(db_contact)
 
 @router.put("/{contact_id}", response_model=schemas.ContactResponse)
-def update_contact(contact_id: int, contact: schemas.ContactUpdate, db: Session = Depends(get_db)):
-    db_contact = handler.update_contact(db, contact_id, contact)
+async def update_contact(contact_id: int, contact: schemas.ContactUpdate, db: AsyncSession = Depends(get_db)):
+    db_contact = await handler.update_contact(db, contact_id, contact)
     if not db_contact:
         raise HTTPException(status_code=404, detail="Contact not found")
+    await invalidate_contacts_cache()
     return db_contact
 
 @router.delete("/{contact_id}", response_model=schemas.ContactResponse)
-def delete_contact(contact_id: int, db: Session = Depends(get_db)):
-    db_contact = handler.delete_contact(db, contact_id)
+async def delete_contact(contact_id: int, db: AsyncSession = Depends(get_db)):
+    db_contact = await handler.delete_contact(db, contact_id)
     if not db_contact:
         raise HTTPException(status_code=404, detail="Contact not found")
+    await invalidate_contacts_cache()
     return db_contact
 
-@router.get("/search", response_model=List[schemas.ContactResponse])
-def search_contacts(name: str = None, surname: str = None, email: str = None, db: Session = Depends(get_db)):
-    return handler.search_contacts(db, name=name, surname=surname, email=email)
-
-@router.get("/birthdays", response_model=List[schemas.ContactResponse])
-def get_upcoming_birthdays(db: Session = Depends(get_db)):
-    return handler.get_upcoming_birthdays(db)
-
-
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: UserLogin, db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.email, form_data.password)
+async def login_for_access_token(form_data: UserLogin, db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.email, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,9 +139,9 @@ def login_for_access_token(form_data: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/refresh", response_model=schemas.Token)
-def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_db)):
     try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(refresh_token)
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(
@@ -91,7 +149,7 @@ def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
                 detail="Invalid refresh token",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        user = get_user_by_email(db, email=email)
+        user = await get_user_by_email(db, email=email)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -110,32 +168,14 @@ def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
 
 
 @router.get("/verify")
-def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email = payload.get("sub")
-        user = get_user_by_email(db, email)
+        user = await get_user_by_email(db, email)
         if user:
             user.is_verified = True
-            db.commit()
+            await db.commit()
             return {"msg": "Email successfully verified"}
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid token")
-
-load_dotenv()
-cloudinary.config(
-  cloud_name=os.getenv("cloud_name"),
-  api_key=os.getenv("api_key"),
-  api_secret=os.getenv("api_secret")
-)
-
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-
-@router.put("/avatar")
-async def update_avatar(request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    result = cloudinary.uploader.upload(file.file)
-    user = get_current_user(db, token=oauth2_scheme(request))
-    user.avatar_url = result['secure_url']
-    db.commit()
-    return {"msg": "Avatar updated", "avatar_url": result['secure_url']}
\ No newline at end of file
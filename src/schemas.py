@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, TypeAdapter
+from typing import List, Optional
 from datetime import date
 
 class ContactBase(BaseModel):
@@ -13,6 +13,7 @@ class ContactBase(BaseModel):
         birthday (date): Дата рождения контакта.
         additional_info (Optional[str]): Дополнительная информация о контакте (по желанию).
     """
+    model_config = ConfigDict(from_attributes=True)
     first_name: str
     last_name: str
     email: EmailStr
@@ -41,8 +42,23 @@ class ContactResponse(ContactBase):
     Атрибуты: id (int): Уникальный идентификатор контакта.
     """
     id: int
-    class Config:
-        from_attributes = True
+
+
+class ContactPage(BaseModel):
+    """
+    Модель для представления страницы контактов в ответе API.
+    Атрибуты:
+        items (List[ContactResponse]): Контакты на текущей странице.
+        total (Optional[int]): Общее количество контактов; заполняется только для первой страницы.
+        next_cursor (Optional[int]): Значение after_id для следующей страницы или None, если страница последняя.
+    """
+    model_config = ConfigDict(from_attributes=True)
+    items: List[ContactResponse]
+    total: Optional[int] = None
+    next_cursor: Optional[int] = None
+
+
+ContactListAdapter = TypeAdapter(List[ContactResponse])
 
 
 class UserCreate(BaseModel):
@@ -52,6 +68,7 @@ class UserCreate(BaseModel):
         email (EmailStr): Электронная почта пользователя.
         password (str): Пароль пользователя.
     """
+    model_config = ConfigDict(from_attributes=True)
     email: EmailStr
     password: str
 
@@ -64,6 +81,7 @@ class Token(BaseModel):
         refresh_token (str): Токен обновления.
         token_type (str): Тип токена (по умолчанию "bearer").
     """
+    model_config = ConfigDict(from_attributes=True)
     access_token: str
     refresh_token: str
     token_type: str = "bearer"
@@ -76,5 +94,6 @@ class UserLogin(BaseModel):
         email (EmailStr): Электронная почта пользователя.
         password (str): Пароль пользователя.
     """
+    model_config = ConfigDict(from_attributes=True)
     email: EmailStr
     password: str
@@ -1,8 +1,10 @@
+import asyncio
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
+from types import SimpleNamespace
 from datetime import datetime
-from sqlalchemy.orm import Session
-from src.database.models import Contact
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.models import Contact, User, authenticate_user, get_password_hash, pwd_context
 from src.schemas import ContactCreate, ContactUpdate
 from src.handler import (
     get_contact,
@@ -10,14 +12,17 @@ from src.handler import (
     create_contact,
     update_contact,
     delete_contact,
-    search_contacts
+    search_contacts,
+    get_current_user,
+    create_access_token,
+    ContactLoader
 )
 
 
-class TestContactHandlers(unittest.TestCase):
+class TestContactHandlers(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.db = MagicMock(spec=Session)
+        self.db = MagicMock(spec=AsyncSession)
         self.contact_data = {
             "id": 1,
             "first_name": "John",
@@ -27,23 +32,43 @@ class TestContactHandlers(unittest.TestCase):
             "birthday": datetime(1990, 1, 1)
         }
         self.contact = Contact(**self.contact_data)
+        self.result = MagicMock()
+        self.db.execute.return_value = self.result
 
-    def test_get_contact(self):
-        self.db.query().filter().first.return_value = self.contact
-        result = get_contact(self.db, contact_id=1)
-        self.db.query().filter().first.assert_called_once()
+    async def test_get_contact(self):
+        self.result.scalar_one_or_none.return_value = self.contact
+        result = await get_contact(self.db, contact_id=1)
+        self.db.execute.assert_awaited_once()
         self.assertEqual(result.first_name, "John")
         self.assertEqual(result.email, "johndoe@example.com")
 
-    def test_get_contacts(self):
-        contacts = [self.contact]
-        self.db.query().offset().limit().all.return_value = contacts
-        result = get_contacts(self.db, skip=0, limit=10)
-        self.db.query().offset().limit().all.assert_called_once()
+    async def test_get_contacts(self):
+        self.result.all.return_value = [SimpleNamespace(Contact=self.contact, total=1)]
+        result, total, next_cursor = await get_contacts(self.db, after_id=None, limit=10)
+        self.db.execute.assert_awaited_once()
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0].first_name, "John")
+        self.assertEqual(total, 1)
+        self.assertIsNone(next_cursor)
+
+    async def test_get_contacts_next_page_skips_total(self):
+        self.result.all.return_value = [SimpleNamespace(Contact=self.contact)]
+        result, total, next_cursor = await get_contacts(self.db, after_id=0, limit=10)
+        self.db.execute.assert_awaited_once()
+        self.assertNotIn("count", str(self.db.execute.await_args.args[0]).lower())
+        self.assertEqual(result[0].first_name, "John")
+        self.assertIsNone(total)
+        self.assertIsNone(next_cursor)
 
-    def test_create_contact(self):
+    async def test_get_contacts_empty_first_page_total(self):
+        self.result.all.return_value = []
+        result, total, next_cursor = await get_contacts(self.db, after_id=None, limit=10)
+        self.db.execute.assert_awaited_once()
+        self.assertEqual(result, [])
+        self.assertEqual(total, 0)
+        self.assertIsNone(next_cursor)
+
+    async def test_create_contact(self):
         contact_create = ContactCreate(
             first_name="John",
             last_name="Doe",
@@ -51,16 +76,35 @@ class TestContactHandlers(unittest.TestCase):
             phone_number="1234567890",  # Добавлено поле
             birthday=datetime(1990, 1, 1)
         )
-        self.db.add = MagicMock()
-        self.db.commit = MagicMock()
-        self.db.refresh = MagicMock()
-        result = create_contact(self.db, contact_create)
+        result = await create_contact(self.db, contact_create)
         self.db.add.assert_called_once()
-        self.db.commit.assert_called_once()
-        self.db.refresh.assert_called_once()
+        self.db.commit.assert_awaited_once()
+        self.db.refresh.assert_not_awaited()
         self.assertEqual(result.first_name, "John")
 
-    def test_update_contact(self):
+    async def test_contact_loader_batches_loads(self):
+        other = Contact(**{**self.contact_data, "id": 2, "first_name": "Jane"})
+        self.result.scalars.return_value = [other, self.contact]
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__.return_value = self.db
+        loader = ContactLoader(session_factory)
+        first, second, missing = await asyncio.gather(loader.load(1), loader.load(2), loader.load(3))
+        session_factory.assert_called_once()
+        self.db.execute.assert_awaited_once()
+        self.assertEqual(first.first_name, "John")
+        self.assertEqual(second.first_name, "Jane")
+        self.assertIsNone(missing)
+
+    async def test_contact_loader_does_not_cache(self):
+        self.result.scalars.return_value = [self.contact]
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__.return_value = self.db
+        loader = ContactLoader(session_factory)
+        await loader.load(1)
+        await loader.load(1)
+        self.assertEqual(self.db.execute.await_count, 2)
+
+    async def test_update_contact(self):
         contact_update = ContactUpdate(
             first_name="John Updated",
             last_name="Doe",  # Добавлены необходимые поля
@@ -68,31 +112,96 @@ class TestContactHandlers(unittest.TestCase):
             phone_number="1234567890",
             birthday=datetime(1990, 1, 1)
         )
-        self.db.query().filter().first.return_value = self.contact
-        self.db.commit = MagicMock()
-        self.db.refresh = MagicMock()
-        result = update_contact(self.db, contact_id=1, contact=contact_update)
-        self.db.commit.assert_called_once()
-        self.db.refresh.assert_called_once()
+        self.result.scalar_one_or_none.return_value = self.contact
+        result = await update_contact(self.db, contact_id=1, contact=contact_update)
+        self.db.commit.assert_awaited_once()
+        self.db.refresh.assert_not_awaited()
         self.assertEqual(result.first_name, "John Updated")
 
-    def test_delete_contact(self):
-        self.db.query().filter().first.return_value = self.contact
-        self.db.delete = MagicMock()
-        self.db.commit = MagicMock()
-        result = delete_contact(self.db, contact_id=1)
-        self.db.delete.assert_called_once()
-        self.db.commit.assert_called_once()
+    async def test_delete_contact(self):
+        self.result.scalar_one_or_none.return_value = self.contact
+        result = await delete_contact(self.db, contact_id=1)
+        self.db.delete.assert_awaited_once()
+        self.db.commit.assert_awaited_once()
         self.assertEqual(result.id, 1)
 
-    def test_search_contacts(self):
+    async def test_search_contacts(self):
         contacts = [self.contact]
-        self.db.query().filter().all.return_value = contacts
-        result = search_contacts(self.db, name="John", surname=None, email=None)
-        self.db.query().filter().all.assert_called_once()
+        self.result.scalars().all.return_value = contacts
+        result = await search_contacts(self.db, name="John", surname=None, email=None)
+        self.db.execute.assert_awaited_once()
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0].first_name, "John")
 
 
+class TestAuthenticateUser(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.db = MagicMock(spec=AsyncSession)
+        self.user = User(id=1, email="johndoe@example.com", hashed_password=get_password_hash("secret"))
+        self.result = MagicMock()
+        self.result.first.return_value = MagicMock(id=self.user.id, hashed_password=self.user.hashed_password)
+        self.db.execute.return_value = self.result
+        self.db.get.return_value = self.user
+        # Кэш проверок пароля по умолчанию пуст; тесты не обращаются к настоящему Redis.
+        self.redis = MagicMock(get=AsyncMock(return_value=None), set=AsyncMock())
+        redis_patcher = patch("src.database.models.redis_client", self.redis)
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+
+    async def test_authenticate_user(self):
+        result = await authenticate_user(self.db, "johndoe@example.com", "secret")
+        self.db.get.assert_awaited_once()
+        self.redis.set.assert_awaited_once()
+        self.assertEqual(result.email, "johndoe@example.com")
+
+    async def test_authenticate_user_wrong_password(self):
+        result = await authenticate_user(self.db, "johndoe@example.com", "wrong")
+        self.db.get.assert_not_awaited()
+        self.redis.set.assert_not_awaited()
+        self.assertIsNone(result)
+
+    async def test_authenticate_user_verifies_in_threadpool(self):
+        with patch("src.database.models.run_in_threadpool", AsyncMock(return_value=True)) as run_in_threadpool:
+            result = await authenticate_user(self.db, "johndoe@example.com", "secret")
+        run_in_threadpool.assert_awaited_once_with(pwd_context.verify, "secret", self.user.hashed_password)
+        self.assertEqual(result.email, "johndoe@example.com")
+
+    async def test_authenticate_user_cached_verification(self):
+        self.redis.get.return_value = b"1"
+        with patch("src.database.models.pwd_context") as pwd_context:
+            result = await authenticate_user(self.db, "johndoe@example.com", "secret")
+        pwd_context.verify.assert_not_called()
+        self.redis.set.assert_not_awaited()
+        self.assertEqual(result.email, "johndoe@example.com")
+
+    async def test_authenticate_user_unknown_email(self):
+        self.result.first.return_value = None
+        result = await authenticate_user(self.db, "nobody@example.com", "secret")
+        self.db.get.assert_not_awaited()
+        self.redis.get.assert_not_awaited()
+        self.redis.set.assert_not_awaited()
+        self.assertIsNone(result)
+
+
+class TestGetCurrentUser(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.db = MagicMock(spec=AsyncSession)
+        self.user = User(id=1, email="johndoe@example.com")
+        self.result = MagicMock()
+        self.result.scalar_one_or_none.return_value = self.user
+        self.db.execute.return_value = self.result
+        self.request = SimpleNamespace(state=SimpleNamespace())
+
+    async def test_get_current_user_cached_per_request(self):
+        token = create_access_token(data={"sub": "johndoe@example.com"})
+        first = await get_current_user(self.request, self.db, token)
+        second = await get_current_user(self.request, self.db, token)
+        self.db.execute.assert_awaited_once()
+        self.assertIs(first, second)
+        self.assertIs(self.request.state.user, self.user)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,37 +1,63 @@
+import asyncio
+import json
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from src.database.db import get_db, Base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from src.database.db import get_db, get_session_maker, Base
+from src.handler import get_current_user, create_refresh_token
+from src.router import AVATAR_UPLOAD_CHUNK_SIZE
 from main import app
-from src.database.models import Contact
+from src.database.models import Contact, User, get_password_hash
 import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from redis.exceptions import ConnectionError as RedisConnectionError
 
 @pytest.fixture(scope="module")
 def session():
-    SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite://"
+    engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def create_all():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
 
-    Base.metadata.create_all(bind=engine)
+    async def drop_all():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
 
+    asyncio.run(create_all())
     db = TestingSessionLocal()
     yield db
-    db.close()
-    Base.metadata.drop_all(bind=engine)
+    asyncio.run(db.close())
+    asyncio.run(drop_all())
 
 
 @pytest.fixture(scope="module")
 def client(session):
-    def override_get_db():
+    async def override_get_db():
         try:
             yield session
         finally:
-            session.close()
+            await session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_maker] = lambda: async_sessionmaker(session.bind, expire_on_commit=False)
+    FastAPICache.init(InMemoryBackend(), prefix="test-cache")
     with TestClient(app) as client:
         yield client
+    if hasattr(app.state, "contact_loader"):
+        del app.state.contact_loader
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -43,9 +69,12 @@ def setup_database(session):
         phone_number="1234567890",
         birthday=datetime.date(1990, 1, 1)
     )
-    session.add(initial_contact)
-    session.commit()
-    session.refresh(initial_contact)
+
+    async def add_contact():
+        session.add(initial_contact)
+        await session.commit()
+
+    asyncio.run(add_contact())
     yield initial_contact.id
 
 
@@ -65,7 +94,39 @@ def test_create_contact(client):
 def test_read_contacts(client):
     response = client.get("/contacts/")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
+    assert response.json()["total"] == len(response.json()["items"])
+
+
+def test_read_contacts_last_page_exact_multiple(client):
+    everything = client.get("/contacts/?limit=100").json()
+    total = everything["total"]
+    assert total == len(everything["items"]) and total > 0
+
+    page = client.get(f"/contacts/?limit={total}").json()
+    assert len(page["items"]) == total
+    assert page["next_cursor"] is None
+
+    last_id = everything["items"][-1]["id"]
+    empty = client.get(f"/contacts/?limit={total}&after_id={last_id}").json()
+    assert empty["items"] == []
+    assert empty["total"] is None
+    assert empty["next_cursor"] is None
+
+
+@pytest.mark.parametrize("limit", [0, -1, 101])
+def test_read_contacts_rejects_invalid_limit(client, limit):
+    response = client.get(f"/contacts/?limit={limit}")
+    assert response.status_code == 422
+
+
+def test_read_contacts_keyset_pagination(client):
+    first_page = client.get("/contacts/?limit=1").json()
+    assert len(first_page["items"]) == 1
+    assert first_page["next_cursor"] == first_page["items"][0]["id"]
+
+    second_page = client.get(f"/contacts/?limit=1&after_id={first_page['next_cursor']}").json()
+    assert all(item["id"] > first_page["next_cursor"] for item in second_page["items"])
 
 
 def test_read_contact(client, setup_database):
@@ -97,3 +158,119 @@ def test_search_contacts(client):
     response = client.get("/contacts/search?name=John")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+
+def test_birthday_index_created(session):
+    assert "ix_contact_bday_md" in {index.name for index in Contact.__table__.indexes}
+
+    async def index_names():
+        result = await session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        return set(result.scalars())
+
+    assert "ix_contact_bday_md" in asyncio.run(index_names())
+
+
+def test_get_upcoming_birthdays(client, session):
+    soon = datetime.date.today() + datetime.timedelta(days=3)
+    contact = Contact(
+        first_name="Birthday",
+        last_name="Soon",
+        email="birthday@example.com",
+        phone_number="5550001111",
+        birthday=soon.replace(year=1985) if (soon.month, soon.day) != (2, 29) else datetime.date(1984, 2, 29)
+    )
+
+    async def add_contact():
+        session.add(contact)
+        await session.commit()
+
+    asyncio.run(add_contact())
+    response = client.get("/contacts/birthdays")
+    assert response.status_code == 200
+    assert "birthday@example.com" in [item["email"] for item in response.json()]
+
+
+def test_search_contacts_by_surname_and_email(client):
+    response = client.get("/contacts/search?surname=doe&email=janedoe")
+    assert response.status_code == 200
+    assert [item["email"] for item in response.json()] == ["janedoe@example.com"]
+
+
+def test_export_contacts(client):
+    response = client.get("/contacts/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert "janedoe@example.com" in [line["email"] for line in lines]
+
+
+def test_read_contact_after_update_not_stale(client):
+    contact_id = client.get("/contacts/search?email=janedoe").json()[0]["id"]
+    assert client.get(f"/contacts/{contact_id}").json()["additional_info"] is None
+
+    update_data = {
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "email": "janedoe@example.com",
+        "phone_number": "0987654321",
+        "birthday": "1991-02-02",
+        "additional_info": "updated"
+    }
+    assert client.put(f"/contacts/{contact_id}", json=update_data).status_code == 200
+    assert client.get(f"/contacts/{contact_id}").json()["additional_info"] == "updated"
+
+
+def test_write_succeeds_when_cache_unavailable(client):
+    backend = MagicMock(
+        get=AsyncMock(side_effect=RedisConnectionError()),
+        set=AsyncMock(side_effect=RedisConnectionError()),
+        get_with_ttl=AsyncMock(side_effect=RedisConnectionError()),
+    )
+    contact_data = {
+        "first_name": "Offline",
+        "last_name": "Cache",
+        "email": "offline@example.com",
+        "phone_number": "5550002222",
+        "birthday": "1992-03-03"
+    }
+    with patch("src.database.cache.FastAPICache.get_backend", return_value=backend):
+        response = client.post("/contacts/", json=contact_data)
+    assert response.status_code == 200
+    assert "offline@example.com" in [item["email"] for item in client.get("/contacts/search?email=offline").json()]
+
+
+def test_update_avatar(client):
+    user = SimpleNamespace(email="johndoe@example.com", avatar_url=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    uploaded = []
+
+    def fake_upload_large(file, **kwargs):
+        uploaded.append(file.read())
+        return {"secure_url": "https://res.cloudinary.com/demo/image/upload/avatar.png"}
+
+    upload_large = MagicMock(side_effect=fake_upload_large)
+    with patch("src.router.cloudinary.uploader.upload_large", upload_large):
+        response = client.put("/contacts/avatar", files={"file": ("avatar.png", b"png-bytes", "image/png")})
+    app.dependency_overrides.pop(get_current_user)
+
+    assert response.status_code == 200
+    upload_large.assert_called_once()
+    assert uploaded == [b"png-bytes"]
+    assert upload_large.call_args.kwargs == {"resource_type": "image", "chunk_size": AVATAR_UPLOAD_CHUNK_SIZE}
+    assert user.avatar_url == "https://res.cloudinary.com/demo/image/upload/avatar.png"
+    assert response.json()["avatar_url"] == user.avatar_url
+
+
+def test_login_and_refresh_ignore_email_case(client, session):
+    async def add_user():
+        session.add(User(email="johndoe@example.com", hashed_password=get_password_hash("secret")))
+        await session.commit()
+
+    asyncio.run(add_user())
+    with patch("src.database.models.redis_client", AsyncMock(get=AsyncMock(return_value=None))):
+        response = client.post("/contacts/token", json={"email": "JohnDoe@Example.com", "password": "secret"})
+    assert response.status_code == 200
+
+    refresh_token = create_refresh_token(data={"sub": "JohnDoe@Example.com"})
+    response = client.post("/contacts/refresh", params={"refresh_token": refresh_token})
+    assert response.status_code == 200